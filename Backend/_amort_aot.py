@@ -0,0 +1,19 @@
+"""Ahead-of-time compilation of the amortization kernel.
+
+Run ``python _amort_aot.py`` at build time (the Dockerfile does this) to
+produce the ``amort_native`` extension module next to this file. main.py
+imports it when present, so workers skip Numba's JIT entirely, and falls
+back to the JIT kernel in ``_amort_kernel`` when it has not been built.
+"""
+import os
+
+from numba.pycc import CC
+
+from _amort_kernel import amort_core
+
+cc = CC("amort_native")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+cc.export("amort_core", "f8[:,:](f8, f8, f8, i8)")(amort_core.py_func)
+
+if __name__ == "__main__":
+    cc.compile()
@@ -0,0 +1,35 @@
+import numpy as np
+from numba import njit
+
+# Numeric core of the amortization schedule, compiled to native code by Numba.
+# Fills one contiguous buffer with rows: payment, principal, interest, balance.
+# A month-by-month loop (rather than the closed-form expm1/log1p balances it
+# replaced) mirrors the original schedule rules exactly: the
+# min(payment - interest, balance) cap, the zero floor and the final-month
+# adjustment.
+@njit(cache=True, fastmath=True, nogil=True)
+def amort_core(principal, monthly_rate, monthly_payment, n):
+    # Kept as float64: float32 balances drift by more than a cent on 30-year loans
+    schedule = np.empty((4, n), dtype=np.float64)
+
+    balance = principal
+    for i in range(n):
+        interest = balance * monthly_rate
+        principal_payment = min(monthly_payment - interest, balance)
+        closing = balance - principal_payment
+        schedule[2, i] = interest
+        if i == n - 1 and closing > 0:  # Adjust final payment to clear balance
+            schedule[0, i] = principal_payment + closing
+            schedule[1, i] = principal_payment + closing - interest
+            closing = 0.0
+        else:
+            schedule[0, i] = monthly_payment
+            schedule[1, i] = principal_payment
+            closing = max(0.0, closing)  # Ensure no negative balance
+        schedule[3, i] = closing
+        balance = closing
+
+    return schedule
+
+# Compile (or load from the on-disk cache) when this module is first imported
+amort_core(1000.0, 0.01, 100.0, 12)
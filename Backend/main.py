@@ -1,105 +1,204 @@
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Literal, Optional, Union
+from dataclasses import dataclass, asdict
 from datetime import datetime
+from functools import lru_cache
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
+import time
 import uuid
-import pandas as pd
-import numpy as np
+import csv
 import io
 
+logger = logging.getLogger(__name__)
+
+# Run the loan writer for the lifetime of the app and flush it on shutdown.
+# The queue and pending map are created here so they belong to the event loop
+# that serves this app, not to whichever loop first touched a module global.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.loan_writes = asyncio.Queue()
+    app.state.pending_loans = {}
+    writer = asyncio.create_task(_write_loans(app.state.loan_writes, app.state.pending_loans))
+    writer.add_done_callback(_report_writer_exit)
+    app.state.loan_writer = writer
+    yield
+    # Wait for queued loans to be written, or for the writer to stop (it
+    # cannot drain the queue once it has died)
+    flushed = asyncio.create_task(app.state.loan_writes.join())
+    await asyncio.wait({flushed, writer}, return_when=asyncio.FIRST_COMPLETED)
+    flushed.cancel()
+    writer.cancel()
+    await asyncio.gather(flushed, writer, return_exceptions=True)
+
 # Initialize FastAPI
-app = FastAPI(title="Fintech App - Salary Advance and Loan API")
+app = FastAPI(title="Fintech App - Salary Advance and Loan API", lifespan=lifespan)
+
+# Longest loan term accepted, in months (50 years)
+MAX_LOAN_TERM_MONTHS = 600
 
 # Define input model for salary advance and loan request
 class AdvanceRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     gross_salary: float
-    pay_frequency: str
+    pay_frequency: Literal["Weekly", "Bi-Weekly", "Monthly", "Annually"]
     advance_amount: float
-    loan_amount: Optional[float] = None
-    interest_rate: Optional[float] = None
-    loan_term: Optional[int] = None
+    loan_amount: Optional[float] = Field(None, ge=0)
+    interest_rate: Optional[float] = Field(None, ge=0, le=100)  # Annual percentage
+    loan_term: Optional[int] = Field(None, gt=0, le=MAX_LOAN_TERM_MONTHS)
     include_amortization: Optional[bool] = False
 
 # Define response model for advance and loan calculation
 class AdvanceResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     eligible: bool  # Salary-based eligibility
     advance_approved: bool  # Whether the specific advance request is approved
     max_advance: float
     approved_amount: float
     fee: float
     total_repayable: Optional[float] = None
-    amortization_schedule: Optional[list] = None
+    amortization_schedule: Optional[dict[str, list[Union[int, float]]]] = None  # Column name -> values
     message: str
     loan_id: Optional[str] = None
 
-# In-memory store for loans
-loans_db = {}
+# Define response model for the amortization schedule CSV export
+class CsvExportResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    csv_data: str
+    filename: str
+
+# Record of an approved advance/loan kept in the loan store
+@dataclass(slots=True)
+class LoanRecord:
+    loan_id: str
+    advance_amount: float
+    fee: float
+    timestamp_ns: int  # Formatted only when the loan is retrieved
+    gross_salary: float
+    pay_frequency: str
+    loan_amount: Optional[float]
+    interest_rate: Optional[float]
+    loan_term: Optional[int]
+    total_repayable: Optional[float]
+    amortization_schedule: Optional[dict]
+
+# In-memory LRU store for loans, bounded so it cannot grow without limit
+MAX_LOANS = 10_000
+loans_db: OrderedDict[str, LoanRecord] = OrderedDict()
+
+# Approved loans are queued on app.state.loan_writes and written to loans_db
+# by a background task, so persistence stays off the request path. Queued
+# loans remain readable from app.state.pending_loans until they are written.
+WRITE_BATCH_SIZE = 100
+
+# Write a batch of loans to the store, evicting the least recently used ones
+def _store_loans(records: list) -> None:
+    for record in records:
+        loans_db[record.loan_id] = record
+        if len(loans_db) > MAX_LOANS:
+            loans_db.popitem(last=False)
+
+# Background task: drain the write queue in batches of up to WRITE_BATCH_SIZE
+async def _write_loans(queue: asyncio.Queue, pending: dict) -> None:
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < WRITE_BATCH_SIZE and not queue.empty():
+            batch.append(queue.get_nowait())
+        try:
+            _store_loans(batch)
+        finally:
+            # Always settle the batch so shutdown's join() and the pending map
+            # don't wait on records a failed write will never store
+            for record in batch:
+                pending.pop(record.loan_id, None)
+                queue.task_done()
+
+# Log the loan writer stopping for any reason other than shutdown
+def _report_writer_exit(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Loan writer stopped; loans will be stored inline", exc_info=task.exception())
+
+# Multipliers that convert a salary paid at each frequency to a monthly amount
+_FREQ_FACTORS = {
+    "Weekly": 52 / 12,
+    "Bi-Weekly": 26 / 12,
+    "Monthly": 1.0,
+    "Annually": 1 / 12,
+}
 
 # Helper function to convert annual salary to monthly
 def convert_to_monthly_salary(gross_salary: float, pay_frequency: str) -> float:
-    if pay_frequency == "Weekly":
-        return gross_salary * 52 / 12
-    elif pay_frequency == "Bi-Weekly":
-        return gross_salary * 26 / 12
-    elif pay_frequency == "Monthly":
-        return gross_salary
-    elif pay_frequency == "Annually":
-        return gross_salary / 12
-    else:
-        raise ValueError("Invalid pay_frequency")
+    # pay_frequency is already restricted to the known keys by AdvanceRequest
+    return gross_salary * _FREQ_FACTORS[pay_frequency]
 
-# Helper function to calculate compound interest using Pandas
+# Helper function to calculate compound interest (monthly compounding)
+@lru_cache(maxsize=4096)
 def calculate_compound_interest(principal: float, rate: float, term_months: int) -> float:
-    n = 12  # Monthly compounding
-    t = term_months / 12  # Convert months to years
-    rate = rate / 100  # Convert percentage to decimal
-    df = pd.DataFrame({
-        "principal": [principal],
-        "rate_per_period": [rate / n],
-        "periods": [n * t]
-    })
-    df["total_repayable"] = df["principal"] * (1 + df["rate_per_period"]) ** df["periods"]
-    return round(df["total_repayable"].iloc[0], 2)
-
-# Helper function to generate amortization schedule using Pandas
-def generate_amortization_schedule(principal: float, rate: float, term_months: int) -> pd.DataFrame:
+    monthly_rate = rate / 100 / 12  # Convert annual percentage to monthly decimal
+    total_repayable = principal * (1 + monthly_rate) ** term_months
+    return round(total_repayable, 2)
+
+# Header row of the exported amortization schedule CSV
+AMORTIZATION_CSV_HEADER = ["Month", "Payment", "Principal", "Interest", "Balance"]
+
+# Amortization kernel, resolved once on first use. Prefers the ahead-of-time
+# compiled extension built by _amort_aot.py and falls back to the Numba JIT.
+@lru_cache(maxsize=None)
+def _load_amort_core():
+    try:
+        from amort_native import amort_core
+    except ImportError:
+        from _amort_kernel import amort_core
+    return amort_core
+
+# Rounded schedule columns. The array is read-only because cached copies are
+# shared between every request with the same parameters.
+def _amortization_columns(principal: float, rate: float, term_months: int) -> "np.ndarray":
+    # NumPy and the kernel are imported on first use, so workers that never
+    # build a schedule skip their import and compile cost
+    import numpy as np
+    amort_core = _load_amort_core()
+
     monthly_rate = rate / 100 / 12
-    if monthly_rate == 0:
+    if monthly_rate == 0:  # Interest-free loan (a 0% rate is valid input)
         monthly_payment = principal / term_months
     else:
         monthly_payment = principal * (monthly_rate * (1 + monthly_rate) ** term_months) / ((1 + monthly_rate) ** term_months - 1)
     monthly_payment = round(monthly_payment, 2)
 
-    # Initialize DataFrame with initial balance
-    df = pd.DataFrame({
-        "Month": range(1, term_months + 1),
-        "Balance": [principal] + [0] * (term_months - 1),
-        "Payment": [0] * term_months
-    })
-
-    balance = principal
-    for i in range(term_months):
-        if i > 0:
-            df.at[i, "Balance"] = balance
-        interest = balance * monthly_rate
-        principal_payment = min(monthly_payment - interest, balance)
-        balance -= principal_payment
-        if i == term_months - 1 and balance > 0:  # Adjust final payment to clear balance
-            df.at[i, "Payment"] = principal_payment + balance
-            df.at[i, "Interest"] = interest
-            df.at[i, "Principal"] = principal_payment + balance - interest
-            df.at[i, "Balance"] = 0
-        else:
-            df.at[i, "Payment"] = monthly_payment
-            df.at[i, "Interest"] = interest
-            df.at[i, "Principal"] = principal_payment
-            df.at[i, "Balance"] = max(0, balance)  # Ensure no negative balance
-        balance = df.at[i, "Balance"]
-
-    return df[["Month", "Payment", "Principal", "Interest", "Balance"]].round(2)
+    schedule = amort_core(float(principal), monthly_rate, monthly_payment, term_months)
+    np.round(schedule, 2, out=schedule)  # Round every column in a single in-place pass
+    schedule.flags.writeable = False
+    return schedule
+
+# Cache of _amortization_columns keyed by loan parameters. Only terms up to
+# MAX_LOAN_TERM_MONTHS are cached, so a full cache holds at most
+# 1024 * 4 * 600 float64 values (about 20 MB).
+_cached_amortization_columns = lru_cache(maxsize=1024)(_amortization_columns)
+
+# Helper function to generate amortization schedule as columns (one list per field)
+def generate_amortization_schedule(principal: float, rate: float, term_months: int) -> dict:
+    # Lists are rebuilt on every call so callers never share mutable state
+    columns = _cached_amortization_columns if term_months <= MAX_LOAN_TERM_MONTHS else _amortization_columns
+    payments, principals, interests, balances = columns(principal, rate, term_months).tolist()
+    return {
+        "month": list(range(1, term_months + 1)),
+        "payment": payments,
+        "principal": principals,
+        "interest": interests,
+        "balance": balances,
+    }
 
 # Endpoint to calculate salary advance and loan
-@app.post("/calculate_advance")
+# Declaring the response model lets Pydantic serialize straight to JSON bytes
+@app.post("/calculate_advance", response_model=Union[AdvanceResponse, CsvExportResponse])
 async def calculate_advance(request: AdvanceRequest, export_csv: Optional[bool] = False):
     try:
         # Step 1: Determine eligibility (based on salary threshold)
@@ -107,15 +206,16 @@ async def calculate_advance(request: AdvanceRequest, export_csv: Optional[bool]
         min_salary_threshold = 1000
         eligible = monthly_salary >= min_salary_threshold
 
+        # Responses are built from values computed here, so skip re-validation
         if not eligible:
-            return {
-                "eligible": False,
-                "advance_approved": False,
-                "max_advance": 0.0,
-                "approved_amount": 0.0,
-                "fee": 0.0,
-                "message": "Ineligible: Monthly salary is below the minimum threshold of $1000."
-            }
+            return AdvanceResponse.model_construct(
+                eligible=False,
+                advance_approved=False,
+                max_advance=0.0,
+                approved_amount=0.0,
+                fee=0.0,
+                message="Ineligible: Monthly salary is below the minimum threshold of $1000."
+            )
 
         # Step 2: Calculate maximum advance (50% of monthly salary)
         max_advance = monthly_salary * 0.5
@@ -131,50 +231,59 @@ async def calculate_advance(request: AdvanceRequest, export_csv: Optional[bool]
         if advance_approved and request.loan_amount and request.interest_rate and request.loan_term:
             total_repayable = calculate_compound_interest(request.loan_amount, request.interest_rate, request.loan_term)
             if request.include_amortization or export_csv:
-                amortization_df = generate_amortization_schedule(request.loan_amount, request.interest_rate, request.loan_term)
-                amortization_schedule = amortization_df.to_dict("records")
+                # Build the schedule in a worker thread to keep the event loop free
+                amortization_schedule = await asyncio.to_thread(
+                    generate_amortization_schedule, request.loan_amount, request.interest_rate, request.loan_term
+                )
                 if export_csv:
                     csv_buffer = io.StringIO()
-                    amortization_df.to_csv(csv_buffer, index=False)
-                    return {"csv_data": csv_buffer.getvalue(), "filename": "amortization_schedule.csv"}
+                    writer = csv.writer(csv_buffer, lineterminator="\n")
+                    writer.writerow(AMORTIZATION_CSV_HEADER)
+                    writer.writerows(zip(*amortization_schedule.values()))
+                    return CsvExportResponse.model_construct(csv_data=csv_buffer.getvalue(), filename="amortization_schedule.csv")
 
         # Step 5: Record the loan (if approved)
-        loan_id = str(uuid.uuid4()) if advance_approved else None
+        loan_id = uuid.uuid4().hex if advance_approved else None
         if advance_approved:
-            loan_record = {
-                "loan_id": loan_id,
-                "advance_amount": request.advance_amount,
-                "fee": fee,
-                "timestamp": datetime.now().isoformat(),
-                "gross_salary": request.gross_salary,
-                "pay_frequency": request.pay_frequency,
-                "loan_amount": request.loan_amount,
-                "interest_rate": request.interest_rate,
-                "loan_term": request.loan_term,
-                "total_repayable": total_repayable,
-                "amortization_schedule": amortization_schedule
-            }
-            loans_db[loan_id] = loan_record
+            loan_record = LoanRecord(
+                loan_id=loan_id,
+                advance_amount=request.advance_amount,
+                fee=fee,
+                timestamp_ns=time.time_ns(),
+                gross_salary=request.gross_salary,
+                pay_frequency=request.pay_frequency,
+                loan_amount=request.loan_amount,
+                interest_rate=request.interest_rate,
+                loan_term=request.loan_term,
+                total_repayable=total_repayable,
+                amortization_schedule=amortization_schedule
+            )
+            # Store inline when the writer is not running: it has stopped, or the
+            # app was started without its lifespan (e.g. TestClient without "with")
+            writer = getattr(app.state, "loan_writer", None)
+            if writer is None or writer.done():
+                _store_loans([loan_record])
+            else:
+                app.state.pending_loans[loan_id] = loan_record
+                await app.state.loan_writes.put(loan_record)
 
         # Step 6: Return response
         message = f"Advance approved! Amount: ${request.advance_amount:,.2f}, Fee: ${fee:,.2f}" if advance_approved else f"Requested advance (${request.advance_amount:,.2f}) exceeds maximum allowed (${max_advance:,.2f})."
         if advance_approved and total_repayable:
             message += f". Loan repayable: ${total_repayable:,.2f} over {request.loan_term} months."
 
-        return {
-            "eligible": eligible,
-            "advance_approved": advance_approved,
-            "max_advance": max_advance,
-            "approved_amount": approved_amount,
-            "fee": fee,
-            "total_repayable": total_repayable,
-            "amortization_schedule": amortization_schedule,
-            "message": message,
-            "loan_id": loan_id
-        }
-
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        return AdvanceResponse.model_construct(
+            eligible=eligible,
+            advance_approved=advance_approved,
+            max_advance=max_advance,
+            approved_amount=approved_amount,
+            fee=fee,
+            total_repayable=total_repayable,
+            amortization_schedule=amortization_schedule,
+            message=message,
+            loan_id=loan_id
+        )
+
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
@@ -186,6 +295,31 @@ async def health_check():
 # Endpoint to retrieve loan details
 @app.get("/loan/{loan_id}")
 async def get_loan(loan_id: str):
-    if loan_id not in loans_db:
+    # No pending map exists when the app runs without its lifespan
+    pending_loans = getattr(app.state, "pending_loans", {})
+    if loan_id in loans_db:
+        loans_db.move_to_end(loan_id)
+        record = loans_db[loan_id]
+    elif loan_id in pending_loans:
+        record = pending_loans[loan_id]
+    else:
         raise HTTPException(status_code=404, detail="Loan not found")
-    return loans_db[loan_id]
\ No newline at end of file
+    loan = asdict(record)
+    # Split with integer math; a float of epoch nanoseconds can be off by 1 µs
+    seconds, nanos = divmod(loan.pop("timestamp_ns"), 10**9)
+    loan["timestamp"] = datetime.fromtimestamp(seconds).replace(microsecond=nanos // 1000).isoformat()
+    return loan
+
+# Run with uvloop's event loop and the httptools parser. loans_db lives in
+# process memory, so keep one worker unless WEB_CONCURRENCY says otherwise.
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
@@ -1,17 +1,22 @@
 import streamlit as st
-import requests
+import httpx
 import pandas as pd
 import os
 from io import StringIO
 import time
 
+@st.cache_resource
+def get_http_client():
+    # Shared client so repeated submits reuse the pooled keep-alive connection
+    return httpx.Client(timeout=10.0, http2=True)
+
 def get_backend_response(url, payload, max_retries=10, timeout=5):
       for i in range(max_retries):
           try:
-              response = requests.post(url, json=payload, timeout=timeout)
+              response = get_http_client().post(url, json=payload, timeout=timeout)
               response.raise_for_status()
               return response.json()
-          except requests.RequestException:
+          except httpx.HTTPError:
               if i < max_retries - 1:
                   time.sleep(5)
               else:
@@ -81,6 +86,7 @@ with st.form(key="user_input_form"):
         loan_term = st.number_input(
             "Loan Term (Months)",
             min_value=1,
+            max_value=600,
             step=1,
             help="Enter the loan term in months."
         )
@@ -104,7 +110,7 @@ if submit_button:
 
     try:
         # Send request to FastAPI backend
-        response = requests.post(BACKEND_URL, json=payload)
+        response = get_http_client().post(BACKEND_URL, json=payload)
         response.raise_for_status()
         result = response.json()
 
@@ -125,7 +131,8 @@ if submit_button:
             st.write(f"**Total Repayable Amount**: ${result.get('total_repayable'):,.2f}")
             if result.get('amortization_schedule'):
                 st.write("**Amortization Schedule**:")
-                df = pd.DataFrame(result['amortization_schedule'])
+                # Schedule arrives as columns; title-case the names for display
+                df = pd.DataFrame(result['amortization_schedule']).rename(columns=str.title)
                 st.dataframe(df.style.format({
                     "Payment": "${:,.2f}",
                     "Principal": "${:,.2f}",
@@ -136,7 +143,7 @@ if submit_button:
             # Add download button for CSV
                 export_payload = payload.copy()
                 export_payload["export_csv"] = True
-                export_response = requests.post(BACKEND_URL, json=export_payload)
+                export_response = get_http_client().post(BACKEND_URL, json=export_payload)
                 export_response.raise_for_status()
                 export_result = export_response.json()
                 if "csv_data" in export_result:
@@ -149,5 +156,5 @@ if submit_button:
                         mime_type="text/csv"
                 )
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         st.error(f"Error communicating with backend: {str(e)}")